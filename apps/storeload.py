@@ -16,11 +16,12 @@ import database as db
 
 def store_to_csv(dbfile, csvfile):
     with open(os.path.expanduser(Path(csvfile)), "w", newline="") as f:
-        db.load(os.path.expanduser(Path(dbfile)))
+        db.load(os.path.expanduser(Path(dbfile)), readonly = True)
         writer = csv.DictWriter(f, fieldnames = db.RECORD_FIELD_NAMES)
         writer.writeheader()
         for record in db.view_dataset():
             writer.writerow(record.as_dict())
+        db.store()
 
 
 def load_from_csv(dbfile, csvfile):
@@ -29,12 +30,22 @@ def load_from_csv(dbfile, csvfile):
         reader = csv.DictReader(f)
         for row in reader:
             del row["ID"]  # auto generated in new database
+            row.pop("Source", None)  # target database owns the record
             rec = db.new_record()  # auto generate ID, and legal with triggers
             rec = dataclasses.replace(rec, **row)
             db.set_record(rec)
         db.store()
 
 
+def store_history_to_csv(dbfile, csvfile):
+    with open(os.path.expanduser(Path(csvfile)), "w", newline="") as f:
+        db.load(os.path.expanduser(Path(dbfile)))
+        writer = csv.writer(f)
+        writer.writerow(db.HISTORY_FIELD_NAMES)
+        writer.writerows(db.get_history())
+        db.store()
+
+
 # === Command Line Interface =================================================
 if __name__ == "__main__":
     import argparse
@@ -44,6 +55,7 @@ if __name__ == "__main__":
 
     Tasks IDs are regenerated on loading.
     Loading is possible to existing database, without checking for duplicates.
+    History is stored as daily aggregates per state, for burndown and velocity.
     '''
     epi = '''
     '''
@@ -81,6 +93,13 @@ if __name__ == "__main__":
         default = None,
         help = "Path to CSV file for loading into database."
     )
+    mutex.add_argument(
+        "--history",
+        "-y",
+        type = str,
+        default = None,
+        help = "Path to CSV file for storing daily history."
+    )
 
     # --- Argument validation ------------------------------------------------
     args = parser.parse_args()
@@ -90,3 +109,5 @@ if __name__ == "__main__":
         store_to_csv(args.file, args.store)
     elif args.load:
         load_from_csv(args.file, args.load)
+    elif args.history:
+        store_history_to_csv(args.file, args.history)
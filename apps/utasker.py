@@ -44,11 +44,18 @@ COLUMN_WIDTHS = MappingProxyType(dict(
             6,      # Points
             10,     # TimeSpent
             0,      # Details
+            10,     # Source
         ]
     )
 ))
 
 # === Classes and Functions ==================================================
+def row_key(
+        rec : db.Record
+) -> str:
+    # IDs are only unique within their own database file
+    return "{}/{}".format(rec.Source, rec.ID)
+
 # --- TUI actions ------------------------------------------------------------
 # Actions update TUI and database together
 
@@ -56,28 +63,28 @@ def act_add_row(
         table : DataTable
 ) -> None:
     new_rec = db.new_record()
-    table.add_row(*new_rec.as_list(), key=new_rec.ID)
+    table.add_row(*new_rec.as_list(), key=row_key(new_rec))
 
 def act_clone_row(
         table : DataTable,
         row_idx : int
 ) -> None:
     clone = table.get_row_at(row_idx)
-    clone_rec = db.new_record()
+    clone_rec = db.new_record(clone[COLUMNS["Source"]])
     clone_rec.Title = "Clone of " + clone[COLUMNS["Title"]]
     clone_rec.Category = clone[COLUMNS["Category"]]
     clone_rec.Priority = clone[COLUMNS["Priority"]]
     clone_rec.Points = clone[COLUMNS["Points"]]
     clone_rec.Details = clone[COLUMNS["Details"]]
     db.set_record(clone_rec)
-    table.add_row(*clone_rec.as_list(), key=clone_rec.ID)
+    table.add_row(*clone_rec.as_list(), key=row_key(clone_rec))
 
 def act_update_row(
         table : DataTable,
         row_idx : int
 ):
     row = table.get_row_at(row_idx)
-    updated = db.get_record(row[COLUMNS["ID"]])
+    updated = db.get_record(row[COLUMNS["ID"]], row[COLUMNS["Source"]])
     updated.State       = row[COLUMNS["State"]]
     updated.Category    = row[COLUMNS["Category"]]
     updated.Priority    = row[COLUMNS["Priority"]]
@@ -89,8 +96,63 @@ def act_update_row(
 
 # === Screens ================================================================
 
+# --- Common: Task list with details of the highlighted task -----------------
+class TaskScreen(Screen):
+    """Screen with a task table and a details panel of the highlighted row
+
+    Details are filled once the highlight settles, so holding a key down
+    through a long table does not rebuild the panel for every row passed.
+    Subclasses provide fill_details(record), taking the highlighted row.
+    """
+    DETAILS_DELAY = 0.1  # seconds, longer than a key auto-repeat
+
+    def cache_details(
+            self,
+            widget_ids : list[str],
+            radioset_ids : list[str] = []
+    ) -> None:
+        # Now that DOM is ready, cache the widgets for easier access later on
+        # Per screen, since each one may exhibit different widgets
+        self.table = self.query_one(".TaskList", DataTable)
+        self.widgets = {w: self.query_one("#"+w) for w in widget_ids + radioset_ids}
+        # Map each radio value to its button
+        self.radio_buttons = {
+            r: {str(b.label): b for b in self.widgets[r].query(RadioButton)}
+            for r in radioset_ids
+        }
+        self.highlighted_row = None
+        self._details_timer = None
+
+    @on(DataTable.RowHighlighted, ".TaskList")
+    def schedule_details(
+            self,
+            message: DataTable.RowHighlighted
+    ) -> None:
+        message.stop()
+        self.highlighted_row = message.cursor_row
+        if self._details_timer is not None:
+            self._details_timer.stop()
+        self._details_timer = self.set_timer(self.DETAILS_DELAY, self.flush_details)
+
+    def flush_details(self) -> None:
+        # Also called before acting on the details, so they match highlighted_row
+        if self._details_timer is None:
+            return  # nothing pending, keep any edits
+        self._details_timer.stop()
+        self._details_timer = None
+        if self.highlighted_row < self.table.row_count:
+            self.fill_details(self.table.get_row_at(self.highlighted_row))
+
+    @on(DataTable.HeaderSelected, ".TaskList")
+    def sort_by_column(
+        self,
+        message: DataTable.HeaderSelected
+    ) -> None:
+        message.data_table.sort(message.column_key)
+
+
 # --- Backlog: Add new tasks here --------------------------------------------
-class Backlog(Screen):
+class Backlog(TaskScreen):
     def compose(self) -> ComposeResult:
         yield Header()
         yield Footer()
@@ -112,64 +174,50 @@ class Backlog(Screen):
                 yield Button("Clone", variant="primary", id="Clone")
 
     def on_mount(self) -> None:
-        table = self.query_one(".TaskList", DataTable)
-        table.border_title = "Backlog"
+        self.cache_details(
+            ["HPoints", "HCheck", "HTitle", "HDetails"],
+            ["HCategories", "HPriorities"],
+        )
+        self.table.border_title = "Backlog"
         for label,width in COLUMN_WIDTHS.items():
-            table.add_column(label=label,width=width,key=label)
+            self.table.add_column(label=label,width=width,key=label)
         element = self.query(".HBorder")
         for e,t in zip(element, ["Points", "Category", "Priority", "Title", "Details"]):
             e.border_title = t
 
     def on_screen_resume(self) -> None:
-        table = self.query_one(".TaskList", DataTable)
-        table.clear()
+        self.table.clear()
         for data in db.view_dataset(["BACKLOG", "UPCOMING"]):
-            table.add_row(*data.as_list(), key=data.ID)
+            self.table.add_row(*data.as_list(), key=row_key(data))
 
-    @on(DataTable.RowHighlighted, ".TaskList")
     def fill_details(
             self,
-            message: DataTable.RowHighlighted
+            record : list
     ) -> None:
-        message.stop()
-        table = message.control
-        self.highlighted_row = message.cursor_row
-        record = table.get_row_at(self.highlighted_row)
-        self.query_one("#HPoints").value = str(record[COLUMNS["Points"]])
-        self.query_one("#HCheck").value = (record[COLUMNS["State"]] == "UPCOMING")
-        self.query_one("#HTitle").value = record[COLUMNS["Title"]]
-        self.query_one("#HDetails").text = record[COLUMNS["Details"]]
-        radioset = self.query_one("#HCategories")
-        buttons = list(radioset.query(RadioButton))
-        idx = sorted(db.get_categories()).index(record[COLUMNS["Category"]])
-        buttons[idx].value = True
-        radioset = self.query_one("#HPriorities")
-        buttons = list(radioset.query(RadioButton))
-        idx = db.get_priorities().index(record[COLUMNS["Priority"]])
-        buttons[idx].value = True
+        self.widgets["HPoints"].value = str(record[COLUMNS["Points"]])
+        self.widgets["HCheck"].value = (record[COLUMNS["State"]] == "UPCOMING")
+        self.widgets["HTitle"].value = record[COLUMNS["Title"]]
+        self.widgets["HDetails"].text = record[COLUMNS["Details"]]
+        self.radio_buttons["HCategories"][record[COLUMNS["Category"]]].value = True
+        self.radio_buttons["HPriorities"][record[COLUMNS["Priority"]]].value = True
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
-        table = self.query_one(".TaskList", DataTable)
+        self.flush_details()
+        table = self.table
         if event.button.id == 'Update':
             # Update TUI with new state, since tied to concrete elements
             table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["Title"]),
-                                 value=self.query_one("#HTitle").value)
+                                 value=self.widgets["HTitle"].value)
             table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["Points"]),
-                                 value=self.query_one("#HPoints").value)
+                                 value=self.widgets["HPoints"].value)
             table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["Details"]),
-                                 value=self.query_one("#HDetails").text)
+                                 value=self.widgets["HDetails"].text)
             table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["State"]),
-                                 value = "UPCOMING" if self.query_one("#HCheck").value else "BACKLOG")
-            radioset = self.query_one("#HCategories")
-            buttons = list(radioset.query(RadioButton))
-            idx = radioset.pressed_index
+                                 value = "UPCOMING" if self.widgets["HCheck"].value else "BACKLOG")
             table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["Category"]),
-                                    value = str(buttons[idx].label))
-            radioset = self.query_one("#HPriorities")
-            buttons = list(radioset.query(RadioButton))
-            idx = radioset.pressed_index
+                                    value = str(self.widgets["HCategories"].pressed_button.label))
             table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["Priority"]),
-                                    value = str(buttons[idx].label))
+                                    value = str(self.widgets["HPriorities"].pressed_button.label))
             # Update underlying database from up to date Datatable
             act_update_row(table=table, row_idx=self.highlighted_row)
 
@@ -182,13 +230,6 @@ class Backlog(Screen):
         else:
             raise ValueError("Unknown button id")
 
-    @on(DataTable.HeaderSelected, ".TaskList")
-    def sort_by_column(
-        self,
-        message: DataTable.HeaderSelected
-    ) -> None:
-        message.data_table.sort(message.column_key)
-
 
 # --- Workbench: Tasks receiving attention -----------------------------------
 class TimeSpent(Static):
@@ -218,7 +259,7 @@ class WarningScreen(ModalScreen):
         self.app.pop_screen()
 
 
-class Workbench(Screen):
+class Workbench(TaskScreen):
     def compose(self) -> ComposeResult:
         yield Header()
         yield Footer()
@@ -240,18 +281,14 @@ class Workbench(Screen):
                 yield Button("Tidy", variant="primary", id="Tidy")
 
     def on_mount(self) -> None:
-        # Now that DOM is ready, cache the widgets for easier access later on
-        # Per screen, since each one may exhibit different widgets
         widget_ids = [
             "TimeSpent", "dec", "inc",
-            "TaskStates",
             "HTitle",
             "HDetails",
             "Update",
             "Tidy",
         ]
-        self.widgets = {w: self.query_one("#"+w) for w in widget_ids}
-        self.table = self.query_one(".TaskList", DataTable)
+        self.cache_details(widget_ids, ["TaskStates"])
         # Design touches
         self.table.border_title = "Workbench"
         for label,width in COLUMN_WIDTHS.items():
@@ -272,26 +309,17 @@ class Workbench(Screen):
     def on_screen_resume(self) -> None:
         self.table.clear()
         for data in db.view_dataset(["ACTIVE", "REVIEW", "UPCOMING"]):
-            self.table.add_row(*data.as_list(), key=data.ID)
+            self.table.add_row(*data.as_list(), key=row_key(data))
         self.refresh_details()
 
-    @on(DataTable.RowHighlighted, ".TaskList")
     def fill_details(
             self,
-            message: DataTable.RowHighlighted
+            record : list
     ) -> None:
-        message.stop()
-        table = message.control
-        self.highlighted_row = message.cursor_row
-        record = table.get_row_at(self.highlighted_row)
         self.widgets["TimeSpent"].set_already_spent(record[COLUMNS["TimeSpent"]])
         self.widgets["HTitle"].value = record[COLUMNS["Title"]]
         self.widgets["HDetails"].text = record[COLUMNS["Details"]]
-
-        radioset = self.widgets["TaskStates"]
-        buttons = list(radioset.query(RadioButton))
-        idx = db.get_states().index(record[COLUMNS["State"]])
-        buttons[idx].value = True
+        self.radio_buttons["TaskStates"][record[COLUMNS["State"]]].value = True
 
     @on(Button.Pressed, "#Update")
     def update_button_pressed(
@@ -299,6 +327,7 @@ class Workbench(Screen):
         message: Button.Pressed
     ) -> None:
         message.stop()
+        self.flush_details()
         # Update TUI with new state, since tied to concrete elements
         spent = float(str(self.widgets["TimeSpent"].renderable))
         self.widgets["TimeSpent"].set_already_spent(spent)
@@ -308,11 +337,8 @@ class Workbench(Screen):
                                 value=self.widgets["HTitle"].value)
         self.table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["Details"]),
                                 value=self.widgets["HDetails"].text)
-        radioset = self.widgets["TaskStates"]
-        buttons = list(radioset.query(RadioButton))
-        idx = radioset.pressed_index
         self.table.update_cell_at(coordinate=Coordinate(row=self.highlighted_row, column=COLUMNS["State"]),
-                                value = str(buttons[idx].label))
+                                value = str(self.widgets["TaskStates"].pressed_button.label))
         # Update underlying database from up to date Datatable
         try:
             act_update_row(table=self.table, row_idx=self.highlighted_row)
@@ -321,12 +347,14 @@ class Workbench(Screen):
 
     @on(Button.Pressed, "#inc")
     def inc(self):
+        self.flush_details()
         points = self.widgets["TimeSpent"]
         value = float(str(points.render())) + 0.5
         points.update(str(value))
 
     @on(Button.Pressed, "#dec")
     def dec(self):
+        self.flush_details()
         points = self.widgets["TimeSpent"]
         value = float(str(points.render())) - 0.5
         if not points.update(str(value)): self.app.bell()
@@ -339,20 +367,13 @@ class Workbench(Screen):
         message.stop()
         self.table.clear()
         for data in db.view_dataset(["ACTIVE", "REVIEW", "UPCOMING"]):
-            self.table.add_row(*data.as_list(), key=data.ID)
+            self.table.add_row(*data.as_list(), key=row_key(data))
         # Has the potential to clear the entire table
         self.refresh_details()
 
-    @on(DataTable.HeaderSelected, ".TaskList")
-    def sort_by_column(
-        self,
-        message: DataTable.HeaderSelected
-    ) -> None:
-        message.data_table.sort(message.column_key)
-
 
 # --- Archive: Retired tasks -------------------------------------------------
-class Archive(Screen):
+class Archive(TaskScreen):
     def compose(self) -> ComposeResult:
         yield Header()
         yield Footer()
@@ -369,43 +390,30 @@ class Archive(Screen):
                 yield Button("Clone to Backlog", variant="primary", id="Clone")
 
     def on_mount(self) -> None:
-        table = self.query_one(".TaskList", DataTable)
-        table.border_title = "Archive"
+        self.cache_details(["HTitle", "HDetails"])
+        self.table.border_title = "Archive"
         for label,width in COLUMN_WIDTHS.items():
-            table.add_column(label=label,width=width,key=label)
+            self.table.add_column(label=label,width=width,key=label)
         element = self.query(".HBorder")
         for e,t in zip(element, ["Title", "Details"]):
             e.border_title = t
 
     def on_screen_resume(self) -> None:
-        table = self.query_one(".TaskList", DataTable)
-        table.clear()
+        self.table.clear()
         for data in db.view_dataset(["CANCELLED", "DONE"]):
-            table.add_row(*data.as_list(), key=data.ID)
+            self.table.add_row(*data.as_list(), key=row_key(data))
 
-    @on(DataTable.RowHighlighted, ".TaskList")
     def fill_details(
             self,
-            message: DataTable.RowHighlighted
+            record : list
     ) -> None:
-        message.stop()
-        table = message.control
-        self.highlighted_row = message.cursor_row
-        record = table.get_row_at(self.highlighted_row)
-        self.query_one("#HTitle").value = record[COLUMNS["Title"]]
-        self.query_one("#HDetails").text = record[COLUMNS["Details"]]
+        self.widgets["HTitle"].value = record[COLUMNS["Title"]]
+        self.widgets["HDetails"].text = record[COLUMNS["Details"]]
 
     def on_button_pressed(self, event: Button.Pressed) -> None:
-        table = self.query_one(".TaskList", DataTable)
-        act_clone_row(table=table, row_idx=self.highlighted_row)
-        table.move_cursor(row=table.row_count - 1)
-
-    @on(DataTable.HeaderSelected, ".TaskList")
-    def sort_by_column(
-        self,
-        message: DataTable.HeaderSelected
-    ) -> None:
-        message.data_table.sort(message.column_key)
+        self.flush_details()
+        act_clone_row(table=self.table, row_idx=self.highlighted_row)
+        self.table.move_cursor(row=self.table.row_count - 1)
 
 
 # === TUI App ================================================================
@@ -455,16 +463,22 @@ if __name__ == "__main__":
         "--file",
         "-f",
         type = str,
+        nargs = "+",
         default = None,
-        help = "Path to database file. None for in-memory, '' for temp file, both without persistence"
+        help = "Path to database file(s), several are shown together. Files are in WAL mode while open. None for in-memory, '' for temp file, both without persistence"
     )
 
     # --- Argument validation ------------------------------------------------
     args = parser.parse_args()
     if args.file is not None:
-        args.file = os.path.expanduser(args.file)
+        args.file = [os.path.expanduser(f) for f in args.file]
+    else:
+        args.file = [None]
 
     # --- Application --------------------------------------------------------
-    db.load(args.file)
-    app = uTaskerApp()
-    app.run()
+    db.load(*args.file)
+    try:
+        app = uTaskerApp()
+        app.run()
+    finally:
+        db.store()  # also leaves files in their previous journal mode
@@ -1,7 +1,9 @@
 from ._database import sqlite3
-from ._database import Record
+from ._database import Database, Record
 from ._database import RECORD_FIELD_NAMES
 from ._database import new_record, get_record, set_record
 from ._database import view_dataset
-from ._database import load, store
+from ._database import load, store, get_sources
 from ._database import get_categories, get_states, get_priorities
+from ._database import HISTORY_FIELD_NAMES
+from ._database import rollup_history, get_history
@@ -3,10 +3,12 @@
 """
 
 # === Imports and Globals ====================================================
+from contextlib import contextmanager
 from dataclasses import dataclass, asdict
-import os.path
 from pathlib import Path
+import queue
 import sqlite3
+import threading
 
 _SCHEMA_FILE = Path(Path(__file__).parent, "utasker.sql")
 
@@ -25,6 +27,7 @@ class Record:
     Points : int = 1
     TimeSpent : float = 0.0
     Details : str = "TBA"
+    Source : str = None
 
     def as_list(self):
         return list(self.__dict__.values())
@@ -44,113 +47,511 @@ def record_factory(cursor, row):
 
 # === Database API ===========================================================
 # --- sqlite3 backend --------------------------------------------------------
-_CON = None
-_DCUR = None
+# Several database files can be loaded at once. Each file is a Source, reached
+# through a connection either directly (main schema) or by ATTACH. SQLite caps
+# the number of attached files per connection, so files are spread in batches
+# over as many connections as needed. Each batch exposes a TEMP UNION view of
+# its Tasks tables, with an added Source column naming the owning file.
+#
+# Files are switched to WAL while loaded. Per batch, a single writer connection takes all
+# changes, one at a time, while a pool of read-only (mode=ro, query_only)
+# reader connections serves queries concurrently. In-memory and temp
+# databases can not be shared between connections, so they read through the
+# writer.
+_FEDERATED_VIEW = "Federated"
+_READERS = 2  # per batch
+_KEEP_LOG_DAYS = 90
+HISTORY_FIELD_NAMES = ["Day", "State", "TasksIn", "TasksOut", "PointsIn", "PointsOut", "TimeSpent"]
 
-def new_record() -> Record:
-    _DCUR.execute("INSERT INTO Tasks DEFAULT VALUES;")
-    res = _DCUR.execute("SELECT * FROM Tasks WHERE ID=last_insert_rowid();")
-    _CON.commit()
-    return res.fetchall()[0]
+@dataclass
+class _Batch:
+    """Connections sharing the same set of attached files"""
+    writer : sqlite3.Connection
+    names : list[str]
+    readers : queue.Queue = None  # None when files can not be shared
+
+@dataclass(frozen=True)
+class _Source:
+    """Database file taking part in the federation"""
+    name : str
+    batch : _Batch
+    schema : str
+
+def _record_cursor(
+        con : sqlite3.Connection
+) -> sqlite3.Cursor:
+    # specialized data record cursor
+    dcur = con.cursor()
+    dcur.row_factory = record_factory
+    return dcur
+
+def _quote(
+        literal : str
+) -> str:
+    return "'" + literal.replace("'", "''") + "'"
+
+def _prepare_db(
+        con : sqlite3.Connection,
+        add_examples : bool = False
+) -> None:
+    with open(_SCHEMA_FILE, "rt") as file:
+        schema_str = file.read()
+    cur = con.cursor()  # default cursor for general operations
+    cur.executescript(schema_str)
+    if add_examples:
+        for i in range(3):
+            cur.execute("""INSERT INTO Tasks DEFAULT VALUES;""")
+        con.commit()
+
+def _needs_schema(
+        con : sqlite3.Connection,
+        schema : str = "main"
+) -> bool:
+    # Empty file, or older one without the history tables
+    res = con.execute(
+        "SELECT COUNT(*) FROM {}.sqlite_master WHERE type='table' AND name IN "
+        "('Tasks', 'TaskLog', 'DailyRollup', 'RollupMark');".format(schema))
+    return res.fetchone()[0] < 4
+
+def _source_name(
+        dbfile : str
+) -> str:
+    return "memory" if not dbfile else Path(dbfile).stem
+
+def _read_only_uri(
+        dbfile : str
+) -> str:
+    return Path(dbfile).resolve().as_uri() + "?mode=ro"
+
+def _attach_limit() -> int:
+    # Connection.getlimit() is only available from Python 3.11 onwards
+    con = sqlite3.connect(":memory:")
+    try:
+        return con.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    except AttributeError:
+        return 10  # SQLITE_MAX_ATTACHED default
+    finally:
+        con.close()
+
+
+class Database:
+    """One or several uTasker database files
+
+    None (or no file at all) opens a non persistent in-memory database.
+    Read only files are left untouched, e.g. for exports: no schema update,
+    no journal mode change and no history rollup.
+    """
+    def __init__(
+            self,
+            *dbfiles : str,
+            readers : int = _READERS,
+            readonly : bool = False
+    ) -> None:
+        if len(dbfiles) == 0:
+            dbfiles = (None,)
+        names = [_source_name(f) for f in dbfiles]
+        if len(set(names)) != len(names):
+            raise ValueError("Database files must have distinct names: {}".format(names))
+
+        self._batches = []
+        self._sources = {}  # source name -> _Source, first one is the primary
+        # Connections are handed over to worker threads, writes are serialized here
+        self._write_lock = threading.RLock()
+        self._journal_modes = {}  # source name -> journal mode to restore
+        shared = all(dbfiles)  # neither in-memory nor temp
+        self._readonly = readonly and shared
+
+        # One time preparation, each file on its own
+        def _open(dbfile : str) -> sqlite3.Connection:
+            if dbfile is None:
+                con = sqlite3.connect(":memory:", check_same_thread=False)
+                _prepare_db(con, add_examples = True)
+            elif self._readonly:
+                con = sqlite3.connect(_read_only_uri(dbfile), uri=True, check_same_thread=False)
+            else:
+                con = sqlite3.connect(dbfile, check_same_thread=False)
+                if _needs_schema(con):
+                    _prepare_db(con)
+            return con
+
+        if len(dbfiles) == 1:
+            # Plain single file, no need to attach
+            con = _open(dbfiles[0])
+            if shared and not self._readonly:
+                self._use_wal(con, "main", names[0])
+            self._add_batch(con, names, ["main"])
+        else:
+            if not all(dbfiles):
+                raise ValueError("In-memory or temp database can not be federated")
+            if not self._readonly:
+                for f in dbfiles:
+                    _open(f).close()
+            limit = _attach_limit()
+            for b in range(0, len(dbfiles), limit):
+                con = sqlite3.connect(":memory:", uri=True, check_same_thread=False)
+                con.execute("PRAGMA foreign_keys=on;")
+                schemas = []
+                for i, f in enumerate(dbfiles[b:b+limit]):
+                    schemas.append("src{}".format(i))
+                    if self._readonly:
+                        f = _read_only_uri(f)
+                    con.execute("ATTACH DATABASE ? AS {};".format(schemas[-1]), (f,))
+                    if not self._readonly:
+                        self._use_wal(con, schemas[-1], names[b+i])
+                self._add_batch(con, names[b:b+limit], schemas)
+
+        if shared and not self._readonly:
+            for batch in self._batches:
+                batch.readers = queue.Queue()
+                files = [dbfiles[names.index(n)] for n in batch.names]
+                schemas = [self._sources[n].schema for n in batch.names]
+                for r in range(readers):
+                    batch.readers.put(self._open_reader(files, schemas, batch.names))
+
+        if len(self._sources) > 1 and not self._readonly:
+            # Categories are shown together, so any of them may land in any file
+            self.update_categories(self.get_categories())
+
+    def _use_wal(
+            self,
+            con : sqlite3.Connection,
+            schema : str,
+            name : str
+    ) -> None:
+        res = con.execute("PRAGMA {}.journal_mode;".format(schema))
+        self._journal_modes[name] = res.fetchone()[0]
+        con.execute("PRAGMA {}.journal_mode=WAL;".format(schema))
+
+    def _add_batch(
+            self,
+            writer : sqlite3.Connection,
+            names : list[str],
+            schemas : list[str]
+    ) -> None:
+        batch = _Batch(writer, names)
+        for name, schema in zip(names, schemas):
+            self._sources[name] = _Source(name, batch, schema)
+        self._create_view(writer, names, schemas)
+        self._batches.append(batch)
+
+    @staticmethod
+    def _create_view(
+            con : sqlite3.Connection,
+            names : list[str],
+            schemas : list[str]
+    ) -> None:
+        union = "\n    UNION ALL\n".join(
+            "    SELECT *, {} AS Source FROM {}.Tasks".format(_quote(n), s)
+            for n, s in zip(names, schemas))
+        con.execute("CREATE TEMP VIEW {} AS\n{};".format(_FEDERATED_VIEW, union))
+
+    def _open_reader(
+            self,
+            dbfiles : list[str],
+            schemas : list[str],
+            names : list[str]
+    ) -> sqlite3.Connection:
+        if schemas == ["main"]:
+            con = sqlite3.connect(_read_only_uri(dbfiles[0]), uri=True, check_same_thread=False)
+        else:
+            con = sqlite3.connect(":memory:", uri=True, check_same_thread=False)
+            for f, s in zip(dbfiles, schemas):
+                con.execute("ATTACH DATABASE ? AS {};".format(s), (_read_only_uri(f),))
+        self._create_view(con, names, schemas)
+        con.execute("PRAGMA query_only=ON;")
+        return con
+
+    def _primary(self) -> _Source:
+        return next(iter(self._sources.values()))
+
+    def _source_of(
+            self,
+            source : str = None
+    ) -> _Source:
+        return self._primary() if source is None else self._sources[source]
+
+    @contextmanager
+    def _reading(
+            self,
+            batch : _Batch
+    ):
+        if batch.readers is None:
+            with self._write_lock:
+                yield batch.writer
+        else:
+            con = batch.readers.get()
+            try:
+                yield con
+            finally:
+                batch.readers.put(con)
+
+    # --- Tasks --------------------------------------------------------------
+    def new_record(
+            self,
+            source : str = None
+    ) -> Record:
+        src = self._source_of(source)
+        with self._write_lock:
+            dcur = _record_cursor(src.batch.writer)
+            dcur.execute("INSERT INTO {}.Tasks DEFAULT VALUES;".format(src.schema))
+            res = dcur.execute(
+                "SELECT *, ? AS Source FROM {}.Tasks WHERE ID=last_insert_rowid();".format(src.schema),
+                (src.name,))
+            rec = res.fetchall()[0]
+            src.batch.writer.commit()
+        return rec
+
+    def get_record(
+            self,
+            id : int,
+            source : str = None
+    ) -> Record:
+        src = self._source_of(source)
+        with self._reading(src.batch) as con:
+            res = _record_cursor(con).execute(
+                "SELECT *, ? AS Source FROM {}.Tasks WHERE ID=?;".format(src.schema),
+                (src.name, id))
+            return res.fetchall()[0]
+
+    def set_record(
+            self,
+            rec : Record
+    ) -> None:
+        # Writes are routed to the file owning the record
+        src = self._source_of(rec.Source)
+        with self._write_lock:
+            src.batch.writer.execute(
+            """
+            UPDATE {}.Tasks
+            SET
+                State = :State,
+                Priority = :Priority,
+                Category = :Category,
+                Title = :Title,
+                Points = :Points,
+                TimeSpent = :TimeSpent,
+                Details = :Details
+            WHERE
+                ID = :ID
+            ;""".format(src.schema),
+            rec.as_dict())
+            src.batch.writer.commit()
+
+    def view_dataset(
+            self,
+            filter : list[str] = []
+    ) -> list[Record]:
+        if len(filter) > 0:
+            filter = str([s for s in filter])[1:-1]
+            filter = "(" + filter + ")"
+            cmd = "SELECT * FROM {} WHERE State IN {}".format(_FEDERATED_VIEW, filter)
+        else:
+            cmd = "SELECT * FROM {};".format(_FEDERATED_VIEW)
+        # Fan out across all batches
+        records = []
+        for batch in self._batches:
+            with self._reading(batch) as con:
+                records += _record_cursor(con).execute(cmd).fetchall()
+        return records
+
+    def close(self) -> None:
+        if not self._readonly:
+            self.rollup_history()
+        for batch in self._batches:
+            while batch.readers is not None and not batch.readers.empty():
+                batch.readers.get().close()
+            # Leave files as found, with all changes back in the main file
+            for name in batch.names:
+                if name in self._journal_modes:
+                    batch.writer.execute("PRAGMA {}.journal_mode={};".format(
+                        self._sources[name].schema, self._journal_modes[name]))
+            batch.writer.close()
+
+    # --- History ------------------------------------------------------------
+    # Triggers append every change of State, Points or TimeSpent to TaskLog.
+    # Rolling up folds the entries added since the last time into DailyRollup,
+    # then old entries already folded are dropped to keep the file size bounded.
+    def _rollup_source(
+            self,
+            src : _Source,
+            keep_days : int
+    ) -> None:
+        s = src.schema
+        con = src.batch.writer
+        with self._write_lock, con:  # all or nothing
+            mark = con.execute("SELECT LastLogID FROM {}.RollupMark;".format(s)).fetchone()[0]
+            last = con.execute("SELECT MAX(LogID) FROM {}.TaskLog;".format(s)).fetchone()[0]
+            if last is not None and last > mark:
+                span = {"mark": mark, "last": last}
+                con.execute(
+                """
+                INSERT INTO {0}.DailyRollup (Day, State, TasksIn, PointsIn, TimeSpent)
+                    SELECT date(Stamp), ToState, SUM(FromState IS NOT ToState),
+                        -- Points edit within the same state is a signed delta
+                        SUM(CASE WHEN FromState IS NOT ToState THEN NewPoints
+                                 ELSE NewPoints - OldPoints END),
+                        SUM(TimeDelta)
+                    FROM {0}.TaskLog
+                    WHERE LogID > :mark AND LogID <= :last
+                    GROUP BY 1, 2
+                ON CONFLICT (Day, State) DO UPDATE SET
+                    TasksIn = TasksIn + excluded.TasksIn,
+                    PointsIn = PointsIn + excluded.PointsIn,
+                    TimeSpent = TimeSpent + excluded.TimeSpent
+                ;""".format(s), span)
+                con.execute(
+                """
+                INSERT INTO {0}.DailyRollup (Day, State, TasksOut, PointsOut)
+                    SELECT date(Stamp), FromState, COUNT(*), SUM(OldPoints)
+                    FROM {0}.TaskLog
+                    WHERE LogID > :mark AND LogID <= :last
+                        AND FromState IS NOT NULL AND FromState IS NOT ToState
+                    GROUP BY 1, 2
+                ON CONFLICT (Day, State) DO UPDATE SET
+                    TasksOut = TasksOut + excluded.TasksOut,
+                    PointsOut = PointsOut + excluded.PointsOut
+                ;""".format(s), span)
+                con.execute("UPDATE {}.RollupMark SET LastLogID = ?;".format(s), (last,))
+                mark = last
+            # Compaction, only of entries already folded
+            con.execute(
+                "DELETE FROM {}.TaskLog WHERE LogID <= ? AND Stamp < datetime('now', 'localtime', ?);".format(s),
+                (mark, "{:+d} days".format(-keep_days)))
+
+    def rollup_history(
+            self,
+            keep_days : int = _KEEP_LOG_DAYS
+    ) -> None:
+        for src in self._sources.values():
+            self._rollup_source(src, keep_days)
+
+    def get_history(
+            self,
+            since : str = None
+    ) -> list[tuple]:
+        """Daily aggregates per state, ordered by day, summed over all sources
+
+        Columns follow HISTORY_FIELD_NAMES, days are local. since is an ISO date
+        (YYYY-MM-DD).
+        """
+        self.rollup_history()
+        history = {}
+        for src in self._sources.values():
+            with self._reading(src.batch) as con:
+                res = con.execute(
+                    "SELECT * FROM {}.DailyRollup WHERE Day >= ?;".format(src.schema),
+                    (since or "",))
+                rows = res.fetchall()
+            for day, state, *counts in rows:
+                acc = history.setdefault((day, state), [0] * len(counts))
+                history[(day, state)] = [a + c for a, c in zip(acc, counts)]
+        return [(*k, *v) for k, v in sorted(history.items())]
+
+    # --- Reference tables ---------------------------------------------------
+    def get_sources(self) -> tuple[str]:
+        return tuple(self._sources.keys())
+
+    def _source_categories(
+            self,
+            src : _Source
+    ) -> set[str]:
+        with self._reading(src.batch) as con:
+            res = con.execute("SELECT * FROM {}.Categories;".format(src.schema))
+            return {x[0] for x in res.fetchall()}
+
+    def get_categories(self) -> set[str]:
+        categories = set()
+        for src in self._sources.values():
+            categories |= self._source_categories(src)
+        return categories
+
+    def update_categories(
+            self,
+            live : set[str]
+    ) -> None:
+        assert self.get_categories() <= live
+        # Every file must accept the categories in use, whichever owns the task
+        with self._write_lock:
+            for src in self._sources.values():
+                additions = live - self._source_categories(src)
+                if len(additions) > 0:
+                    cmd = "INSERT INTO {}.Categories (Category) VALUES (?)".format(src.schema)
+                    src.batch.writer.executemany(cmd, [(s,) for s in additions])
+                    src.batch.writer.commit()
+
+    def get_states(self) -> tuple[str]:
+        src = self._primary()
+        with self._reading(src.batch) as con:
+            res = con.execute("SELECT * FROM {}.States;".format(src.schema))
+            row = res.fetchall()
+        return tuple([x[0] for x in row])
+
+    def get_priorities(self) -> tuple[str]:
+        src = self._primary()
+        with self._reading(src.batch) as con:
+            res = con.execute("SELECT * FROM {}.Priorities;".format(src.schema))
+            row = res.fetchall()
+        return tuple([x[0] for x in row])
+
+
+# --- Default database -------------------------------------------------------
+# Module level API used by the apps, on top of a single Database
+_DB = None
+
+def load(
+        *dbfiles : str,
+        readonly : bool = False
+) -> None:
+    global _DB
+    _DB = Database(*dbfiles, readonly=readonly)
+
+def store():
+    _DB.close()
+
+def new_record(
+        source : str = None
+) -> Record:
+    return _DB.new_record(source)
 
 def get_record(
-        id : int
+        id : int,
+        source : str = None
 ) -> Record:
-    res = _DCUR.execute("SELECT * FROM Tasks WHERE ID=?;", (id,))
-    return res.fetchall()[0]
+    return _DB.get_record(id, source)
 
 def set_record(
         rec : Record
 ) -> None:
-    reclist = rec.as_list()
-    _DCUR.execute(
-    """
-    UPDATE Tasks
-    SET
-        State = ?,
-        Priority = ?,
-        Category = ?,
-        Title = ?,
-        Points = ?,
-        TimeSpent = ?,
-        Details = ?
-    WHERE
-        ID = ?
-    ;""",
-    (*reclist[1:], reclist[0]))  # TODO: nicer to have all in order?
-    _CON.commit()
+    _DB.set_record(rec)
 
 def view_dataset(
         filter : list[str] = []
 ) -> list[Record]:
-    if len(filter) > 0:
-        filter = str([s for s in filter])[1:-1]
-        filter = "(" + filter + ")"
-        cmd = "SELECT * FROM TASKS WHERE State IN {}".format(filter)
-    else:
-        cmd = "SELECT * FROM Tasks;"
-    res = _DCUR.execute(cmd)
-    return res.fetchall()
+    return _DB.view_dataset(filter)
 
-def load(
-        dbfile : str
+def rollup_history(
+        keep_days : int = _KEEP_LOG_DAYS
 ) -> None:
-    global _CON
-    global _DCUR
-    if dbfile is None:
-        _CON = sqlite3.connect(":memory:")
-    else:
-        _CON = sqlite3.connect(dbfile)
+    _DB.rollup_history(keep_days)
 
-    # specialized data record cursor
-    _DCUR = _CON.cursor()
-    _DCUR.row_factory = record_factory
-
-    def _prepare_db(add_examples : bool = False) -> None:
-        with open(_SCHEMA_FILE, "rt") as file:
-            schema_str = file.read()
-        cur = _CON.cursor()  # default cursor for general operations
-        cur.executescript(schema_str)
-        if add_examples:
-            for i in range(3):
-                res = _DCUR.execute("""INSERT INTO Tasks DEFAULT VALUES;""")
-
-    # One time preparation
-    if dbfile is None:
-        _prepare_db(add_examples = True)
-    elif os.path.getsize(dbfile) == 0:  # file already exists
-        _prepare_db()
-    else:
-        pass
+def get_history(
+        since : str = None
+) -> list[tuple]:
+    return _DB.get_history(since)
 
-def store():
-    _CON.close()
+def get_sources() -> tuple[str]:
+    return _DB.get_sources()
 
 def get_categories() -> set[str]:
-    cur = _CON.cursor()
-    res = cur.execute("SELECT * FROM Categories;")
-    row = res.fetchall()
-    return {x[0] for x in row}
+    return _DB.get_categories()
 
 def update_categories(
         live : set[str]
 ) -> None:
-    stored = get_categories()
-    assert stored <= live
-    additions = live - stored
-    if len(additions) > 0:
-        cur = _CON.cursor()
-        cmd = "INSERT INTO Categories (Category) VALUES (?)"
-        cur.executemany(cmd, [(s,) for s in additions])
+    _DB.update_categories(live)
 
 def get_states() -> tuple[str]:
-    cur = _CON.cursor()
-    res = cur.execute("SELECT * FROM States;")
-    row = res.fetchall()
-    return tuple([x[0] for x in row])
+    return _DB.get_states()
 
 def get_priorities() -> tuple[str]:
-    cur = _CON.cursor()
-    res = cur.execute("SELECT * FROM Priorities;")
-    row = res.fetchall()
-    return tuple([x[0] for x in row])
+    return _DB.get_priorities()
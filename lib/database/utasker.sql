@@ -134,3 +134,67 @@ CREATE TRIGGER IF NOT EXISTS IncreaseActiveTimeSpent
         WHERE TaskID = NEW.ID;
     END
 ;
+
+
+-- TaskLog is an append-only history of State, Points and TimeSpent changes
+-- LogID never reuses values of compacted entries, RollupMark relies on it
+-- Stamp is local time, so work is counted on the day it was done
+CREATE TABLE IF NOT EXISTS TaskLog (
+    LogID       INTEGER PRIMARY KEY AUTOINCREMENT,
+    TaskID      INTEGER NOT NULL,
+    Stamp       TEXT NOT NULL DEFAULT (datetime('now', 'localtime')),
+    FromState   TEXT,
+    ToState     TEXT NOT NULL,
+    OldPoints   INTEGER NOT NULL DEFAULT 0,
+    NewPoints   INTEGER NOT NULL DEFAULT 0,
+    TimeDelta   REAL NOT NULL DEFAULT 0
+);
+-- Rules
+CREATE TRIGGER IF NOT EXISTS LogTaskInsert
+    AFTER INSERT ON Tasks
+    BEGIN
+        INSERT INTO TaskLog (TaskID, ToState, NewPoints, TimeDelta)
+        VALUES (NEW.ID, NEW.State, COALESCE(NEW.Points, 0), COALESCE(NEW.TimeSpent, 0));
+    END
+;
+CREATE TRIGGER IF NOT EXISTS LogTaskUpdate
+    AFTER UPDATE OF State, Points, TimeSpent ON Tasks
+    WHEN OLD.State IS NOT NEW.State
+        OR OLD.Points IS NOT NEW.Points
+        OR OLD.TimeSpent IS NOT NEW.TimeSpent
+    BEGIN
+        INSERT INTO TaskLog (TaskID, FromState, ToState, OldPoints, NewPoints, TimeDelta)
+        VALUES (NEW.ID, OLD.State, NEW.State,
+                COALESCE(OLD.Points, 0), COALESCE(NEW.Points, 0),
+                COALESCE(NEW.TimeSpent, 0) - COALESCE(OLD.TimeSpent, 0));
+    END
+;
+
+-- DailyRollup is TaskLog folded into per day and per state aggregates
+-- Points move with State changes, Points edits within a State count as a signed
+-- delta in PointsIn. Open points of a State at a given day is the running sum of
+-- PointsIn - PointsOut
+CREATE TABLE IF NOT EXISTS DailyRollup (
+    Day         TEXT NOT NULL,
+    State       TEXT NOT NULL,
+    TasksIn     INTEGER NOT NULL DEFAULT 0,
+    TasksOut    INTEGER NOT NULL DEFAULT 0,
+    PointsIn    INTEGER NOT NULL DEFAULT 0,
+    PointsOut   INTEGER NOT NULL DEFAULT 0,
+    TimeSpent   REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (Day, State)
+) WITHOUT ROWID;
+
+-- RollupMark holds the last TaskLog entry folded into DailyRollup
+CREATE TABLE IF NOT EXISTS RollupMark (
+    ID          INTEGER PRIMARY KEY CHECK (ID = 1),
+    LastLogID   INTEGER NOT NULL DEFAULT 0
+);
+-- Fill, seeding history with tasks predating TaskLog
+INSERT INTO TaskLog (TaskID, ToState, NewPoints, TimeDelta)
+    SELECT ID, State, COALESCE(Points, 0), COALESCE(TimeSpent, 0) FROM Tasks
+    WHERE NOT EXISTS (SELECT * FROM RollupMark)
+;
+INSERT OR IGNORE INTO RollupMark (ID, LastLogID)
+    VALUES (1, 0)
+;
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""Shared pytest configuration for the uTasker tests
+"""
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption("--slow", action="store_true", default=False,
+                     help="Also run the real time latency tests.")
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: real time latency test, run with --slow")
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--slow"):
+        return
+    skip = pytest.mark.skip(reason="real time latency test, run with --slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Latency of the uTasker TUI, driven by Textual Pilot
+"""
+
+# === Imports and Globals ====================================================
+import asyncio
+from pathlib import Path
+import sys
+import time
+
+import pytest
+
+_ROOT = Path(__file__).parent.parent
+sys.path[:0] = [str(Path(_ROOT, "lib")), str(Path(_ROOT, "apps"))]
+
+# Database
+import database as db
+
+# TUI
+from textual import events
+import utasker
+
+ROWS = 10_000
+KEY_REPEAT = 1 / 30  # seconds, a typical keyboard auto-repeat rate
+
+
+# === Fixtures ===============================================================
+@pytest.fixture
+def backlog_fills(monkeypatch):
+    """In-memory database with ROWS more Backlog tasks, recording each fill"""
+    db.load()
+    try:
+        for i in range(ROWS):
+            rec = db.new_record()
+            rec.Title = "Task {}".format(i)
+            db.set_record(rec)
+
+        fills = []
+        fill_details = utasker.Backlog.fill_details
+        def counting_fill_details(self, record):
+            fills.append(record)
+            fill_details(self, record)
+        monkeypatch.setattr(utasker.Backlog, "fill_details", counting_fill_details)
+        yield fills
+    finally:
+        db.store()
+
+def _last_title(screen) -> str:
+    record = screen.table.get_row_at(screen.table.row_count - 1)
+    return record[utasker.COLUMNS["Title"]]
+
+
+# === Tests ==================================================================
+def test_holding_down_coalesces_backlog_details(backlog_fills, monkeypatch):
+    # The timer is driven by hand, it never fires on its own
+    monkeypatch.setattr(utasker.TaskScreen, "DETAILS_DELAY", 3600)
+
+    async def hold_down():
+        app = utasker.uTaskerApp()
+        async with app.run_test(size=(160, 60)) as pilot:
+            await pilot.pause()
+            screen = app.screen
+            last_row = screen.table.row_count - 1
+            backlog_fills.clear()
+
+            # Key held down through the whole table
+            for n in range(last_row):
+                app.post_message(events.Key("down", None))
+            await pilot.pause()
+            for n in range(last_row):
+                if screen.table.cursor_row == last_row:
+                    break
+                await pilot.pause()
+            assert screen.table.cursor_row == last_row
+            assert backlog_fills == []
+
+            # Key released: the timer fills the panel once, with the last row
+            screen.flush_details()
+            screen.flush_details()
+            assert len(backlog_fills) == 1
+            assert screen.widgets["HTitle"].value == _last_title(screen)
+
+    asyncio.run(hold_down())
+
+@pytest.mark.slow
+def test_holding_down_keeps_up_with_key_repeat(backlog_fills):
+    async def hold_down():
+        app = utasker.uTaskerApp()
+        async with app.run_test(size=(160, 60)) as pilot:
+            await pilot.pause()
+            screen = app.screen
+            last_row = screen.table.row_count - 1
+
+            # Key held down: events arrive at the repeat rate, whether or not
+            # the app has caught up with the previous ones
+            start = time.perf_counter()
+            for n in range(last_row):
+                app.post_message(events.Key("down", None))
+                await asyncio.sleep(max(0, start + (n + 1) * KEY_REPEAT - time.perf_counter()))
+            await pilot.pause(2 * screen.DETAILS_DELAY)
+            lag = time.perf_counter() - start - last_row * KEY_REPEAT
+
+            assert screen.table.cursor_row == last_row
+            assert screen.widgets["HTitle"].value == _last_title(screen)
+            assert lag < 1.0
+
+    asyncio.run(hold_down())